@@ -6,6 +6,7 @@ Features:
 - Creates necessary directories (`prompts/`, `input/`, `output/`).
 - Copies the main application executable to the installation directory.
 - Creates default prompt files.
+- Optionally writes a default YAML configuration file (`default_config.yaml`).
 - Optionally adds the installation directory to the system PATH for easy access.
 - Provides user-friendly logging and error handling.
 """
@@ -15,13 +16,22 @@ import sys
 import argparse
 import logging
 import shutil
-import subprocess
+from functools import lru_cache
 from pathlib import Path
 
+# The log formats never include thread/process fields, so skip collecting them per record
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
 # Setting up the logger
 def setup_logger(log_level=logging.INFO, log_file='gpt_processor_install.log'):
     logger = logging.getLogger('gpt_processor_installer')
     logger.setLevel(log_level)
+    # Drop handlers from a previous in-process run (e.g. repeated GUI installs)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
     formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 
     # Console handler
@@ -40,9 +50,13 @@ def setup_logger(log_level=logging.INFO, log_file='gpt_processor_install.log'):
 
 # Function to create directories
 def create_directories(base_dir, dirs):
+    # Create the base once, then each leaf with a single mkdir instead of a makedirs walk
+    os.makedirs(base_dir, exist_ok=True)
     for directory in dirs:
-        path = os.path.join(base_dir, directory)
-        os.makedirs(path, exist_ok=True)
+        try:
+            os.mkdir(os.path.join(base_dir, directory))
+        except FileExistsError:
+            pass
 
 # Function to create default prompt file
 def create_default_prompt(prompts_dir, logger):
@@ -55,23 +69,27 @@ def create_default_prompt(prompts_dir, logger):
         try:
             with open(default_prompt_path, 'w', encoding='utf-8') as file:
                 file.write(default_prompt)
-            logger.info(f"Created default prompt file at '{default_prompt_path}'.")
+            logger.info("Created default prompt file at '%s'.", default_prompt_path)
         except Exception as e:
-            logger.error(f"Failed to create default prompt file: {e}")
+            logger.error("Failed to create default prompt file: %s", e)
             sys.exit(1)
     else:
-        logger.info(f"Default prompt file already exists at '{default_prompt_path}'.")
+        logger.info("Default prompt file already exists at '%s'.", default_prompt_path)
 
 # Function to copy the main executable
 def copy_main_executable(source_path, dest_dir, logger):
-    if not os.path.isfile(source_path):
-        logger.error(f"Main executable '{source_path}' not found.")
-        sys.exit(1)
+    dest_path = os.path.join(dest_dir, os.path.basename(source_path))
     try:
-        shutil.copy(source_path, dest_dir)
-        logger.info(f"Copied main executable to '{dest_dir}'.")
+        # copyfile uses the OS zero-copy path (sendfile/fcopyfile/CopyFile2) but copies data only;
+        # copymode keeps the executable bit so the installed copy can still be run by name from PATH
+        shutil.copyfile(source_path, dest_path)
+        shutil.copymode(source_path, dest_path)
+        logger.info("Copied main executable to '%s'.", dest_dir)
+    except FileNotFoundError:
+        logger.error("Main executable '%s' not found.", source_path)
+        sys.exit(1)
     except Exception as e:
-        logger.error(f"Failed to copy main executable: {e}")
+        logger.error("Failed to copy main executable: %s", e)
         sys.exit(1)
 
 # Function to create a default configuration file
@@ -87,24 +105,36 @@ def create_default_config(install_dir, logger):
     try:
         with open(config_path, 'w', encoding='utf-8') as file:
             file.write(default_config)
-        logger.info(f"Created default configuration file at '{config_path}'.")
+        logger.info("Created default configuration file at '%s'.", config_path)
     except Exception as e:
-        logger.error(f"Failed to create default configuration file: {e}")
+        logger.error("Failed to create default configuration file: %s", e)
         sys.exit(1)
 
 # Function to add directory to system PATH (Windows)
 def add_to_system_path_windows(directory, logger):
+    import ctypes
+    import winreg
     try:
-        # Get current PATH
-        current_path = os.environ['PATH']
-        if directory in current_path:
-            logger.info(f"'{directory}' is already in the system PATH.")
-            return
-        # Add to PATH using setx
-        subprocess.run(['setx', 'PATH', f'{current_path};{directory}'], check=True)
-        logger.info(f"Added '{directory}' to the system PATH. You may need to restart your command prompt for changes to take effect.")
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Failed to add '{directory}' to system PATH: {e}")
+        # Read the persisted user PATH rather than the inherited process PATH
+        with winreg.OpenKey(winreg.HKEY_CURRENT_USER, 'Environment', 0, winreg.KEY_READ | winreg.KEY_WRITE) as key:
+            try:
+                current_path, _ = winreg.QueryValueEx(key, 'Path')
+            except FileNotFoundError:
+                current_path = ''
+            entries = [entry for entry in current_path.split(';') if entry]
+            target = os.path.normcase(os.path.normpath(directory))
+            if any(os.path.normcase(os.path.normpath(entry)) == target for entry in entries):
+                logger.info("'%s' is already in the system PATH.", directory)
+                return
+            # Write back directly; unlike setx this does not truncate PATH at 1024 characters
+            entries.append(directory)
+            winreg.SetValueEx(key, 'Path', 0, winreg.REG_EXPAND_SZ, ';'.join(entries))
+        # Broadcast WM_SETTINGCHANGE so new shells pick up the change without logging out
+        HWND_BROADCAST, WM_SETTINGCHANGE, SMTO_ABORTIFHUNG = 0xFFFF, 0x001A, 0x0002
+        ctypes.windll.user32.SendMessageTimeoutW(HWND_BROADCAST, WM_SETTINGCHANGE, 0, 'Environment', SMTO_ABORTIFHUNG, 5000, None)
+        logger.info("Added '%s' to the system PATH. You may need to restart your command prompt for changes to take effect.", directory)
+    except OSError as e:
+        logger.error("Failed to add '%s' to system PATH: %s", directory, e)
         sys.exit(1)
 
 # Function to add directory to system PATH (Unix/Linux/Mac)
@@ -122,9 +152,9 @@ def add_to_system_path_unix(directory, shell, logger):
         export_statement = f'\n# Added by GPT Processor Installer\nexport PATH="$PATH:{directory}"\n'
         with open(profile, 'a') as file:
             file.write(export_statement)
-        logger.info(f"Added '{directory}' to PATH in '{profile}'. Please restart your terminal or run 'source {profile}' to apply changes.")
+        logger.info("Added '%s' to PATH in '%s'. Please restart your terminal or run 'source %s' to apply changes.", directory, profile, profile)
     except Exception as e:
-        logger.error(f"Failed to add '{directory}' to system PATH: {e}")
+        logger.error("Failed to add '%s' to system PATH: %s", directory, e)
         sys.exit(1)
 
 # Function to create configuration file
@@ -142,9 +172,10 @@ openai:
     config_path = Path(install_dir) / 'default_config.yaml'
     with open(config_path, 'w') as config_file:
         config_file.write(config_content)
-    logging.info(f"Configuration file created at {config_path}")
+    logging.info("Configuration file created at %s", config_path)
 
-# Detect operating system
+# Detect operating system (invariant for the process, so computed once)
+@lru_cache(maxsize=1)
 def detect_os():
     if sys.platform.startswith('win'):
         return 'windows'
@@ -156,14 +187,15 @@ def detect_os():
         return 'unknown'
 
 # Main installer function
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description='GPT Processor Installer')
     parser.add_argument('--install_dir', type=str, default=None, help='Directory to install GPT Processor.')
-    parser.add_argument('--main_executable', type=str, required=True, help='Path to the main executable.')
+    parser.add_argument('--main_executable', type=str, required=True, help='Path to the main executable to install (e.g., gpt_processor.exe).')
+    parser.add_argument('--create_config', action=argparse.BooleanOptionalAction, default=True, help='Write default_config.yaml to the installation directory.')
     parser.add_argument('--add_to_path', action='store_true', help='Add the installation directory to system PATH.')
     parser.add_argument('--log_file', type=str, help='Path to the log file.')
     parser.add_argument('--verbose', action='store_true', help='Enable verbose logging.')
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     # Set log level based on verbosity
     log_level = logging.DEBUG if args.verbose else logging.INFO
@@ -186,7 +218,7 @@ def main():
             logger.error("Unsupported operating system.")
             sys.exit(1)
 
-    logger.info(f"Installation Directory: {install_dir}")
+    logger.info("Installation Directory: %s", install_dir)
 
     # Create installation directories
     dirs_to_create = ['prompts', 'input', 'output']
@@ -204,7 +236,8 @@ def main():
 
 
     # Create configuration file
-    create_config_file(install_dir, prompts_dir, main_executable_dest)
+    if args.create_config:
+        create_config_file(install_dir, prompts_dir, main_executable_dest)
 
 
     # Add to system PATH if requested
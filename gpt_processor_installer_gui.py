@@ -1,149 +1,199 @@
-import tkinter as tk
-from tkinter import messagebox, filedialog
-import subprocess
+# tkinter is imported inside the functions that need it, and the installer/test
+# logic lives in installer_core, so importing either doesn't pay the Tk load cost
+import asyncio
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
+import threading
+from collections import namedtuple
 from datetime import datetime
 
+import installer_core
+
 # Default values
 default_install_dir = "C:\\upp\\jimmy"
 default_executable_path = "C:\\upp\\ui branch\\FilePromtForge01\\gpt_processor_main.py"
 default_prompt_file = "C:\\upp\\jimmy\\prompts\\standard_prompt.txt"
 default_output_dir = "C:\\upp\\jimmy\\output"
 
-# Create a directory named after the current time
-current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
-log_dir = f"logs_{current_time}"
-os.makedirs(log_dir, exist_ok=True)
-
-# Set up logging
-log_file = os.path.join(log_dir, 'installer_gui.log')
-logging.basicConfig(filename=log_file, level=logging.DEBUG, 
-                    format='%(asctime)s - %(levelname)s - %(message)s')
-
-def run_installer(install_dir, executable_path):
-    logging.debug(f"Starting run_installer with install_dir={install_dir}, executable_path={executable_path}")
-    try:
-        command = [
-            'python', 'gpt_processor_installer.py',
-            '--install_dir', install_dir,
-            '--main_executable', executable_path
-        ]
-        logging.debug(f"Running command: {command}")
-        result = subprocess.run(command, check=True, capture_output=True, text=True)
-        logging.debug(f"Command output: {result.stdout}")
-        logging.debug(f"Command error (if any): {result.stderr}")
-        messagebox.showinfo("Success", "Installation completed successfully.")
-    except subprocess.CalledProcessError as e:
-        error_message = f"Installation failed: {e}"
-        logging.error(error_message)
-        logging.debug(f"Command output: {e.stdout}")
-        logging.debug(f"Command error: {e.stderr}")
-        messagebox.showerror("Error", error_message)
-
-def run_test(install_dir, executable_path, prompt_file, output_dir):
-    logging.debug(f"Starting run_test with install_dir={install_dir}, executable_path={executable_path}, prompt_file={prompt_file}, output_dir={output_dir}")
-    try:
-        input_dir = os.path.join(install_dir, 'input')
-        logging.debug(f"Input directory: {input_dir}")
-        
-        # Check if input directory exists
-        if not os.path.exists(input_dir):
-            logging.error(f"Input directory does not exist: {input_dir}")
-            messagebox.showerror("Error", f"Input directory does not exist: {input_dir}")
-            return
-        
-        # Log the contents of the input directory
-        input_files = os.listdir(input_dir)
-        logging.debug(f"Input directory contents: {input_files}")
-        
-        # Check if input directory is empty
-        if not input_files:
-            logging.error("Input directory is empty.")
-            messagebox.showerror("Error", "Input directory is empty.")
-            return
-
-        # Construct the command to run the main script
-        command = [
-            'python', executable_path,
-            '--config', os.path.join(install_dir, 'default_config.yaml'),
-            '--prompt', prompt_file,
-            '--input_dir', input_dir,
-            '--output_dir', output_dir
-        ]
-        logging.debug(f"Running test command: {command}")
-        result = subprocess.run(command, check=True, capture_output=True, text=True)
-        logging.debug(f"Test command output: {result.stdout}")
-        logging.debug(f"Test command error (if any): {result.stderr}")
-
-        # Save the response to the output directory
-        output_file = os.path.join(output_dir, 'test_output.txt')
-        with open(output_file, 'w', encoding='utf-8') as file:
-            file.write(result.stdout)
-        
-        # Display the response in the GUI
-        messagebox.showinfo("Test Response", result.stdout)
-    except subprocess.CalledProcessError as e:
-        error_message = f"Test failed: {e}"
-        logging.error(error_message)
-        logging.debug(f"Test command output: {e.stdout}")
-        logging.debug(f"Test command error: {e.stderr}")
-        messagebox.showerror("Error", error_message)
-    except Exception as e:
-        error_message = f"An error occurred: {e}"
-        logging.error(error_message)
-        messagebox.showerror("Error", error_message)
+# Queue handler that drops records instead of blocking the Tk thread when the writer falls behind
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+# MemoryHandler that also flushes on records logged with extra={'flush': True}, so the end of an
+# install or test reaches the file without waiting for an ERROR, a full buffer or exit
+class FlushingMemoryHandler(logging.handlers.MemoryHandler):
+    def shouldFlush(self, record):
+        return super().shouldFlush(record) or getattr(record, 'flush', False)
+
+# Set up logging on first use, in a directory named after the current time, so importing
+# this module doesn't create anything on disk. The GUI thread only enqueues records, and a
+# listener thread batches them in memory and writes them to the file in bulk
+log_file = None
+
+def setup_logging():
+    global log_file
+    if log_file:
+        return log_file
+    log_dir = f"logs_{datetime.now():%Y%m%d_%H%M%S}"
+    os.makedirs(log_dir, exist_ok=True)
+    log_file = os.path.join(log_dir, 'installer_gui.log')
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    memory_handler = FlushingMemoryHandler(capacity=1024, flushLevel=logging.ERROR, target=file_handler)
+    log_queue = queue.Queue(maxsize=10000)
+    log_listener = logging.handlers.QueueListener(log_queue, memory_handler, respect_handler_level=True)
+    log_listener.start()
+    logging.getLogger().addHandler(DroppingQueueHandler(log_queue))
+    logging.getLogger().setLevel(logging.DEBUG)
+    atexit.register(memory_handler.flush)
+    atexit.register(log_listener.stop)
+    return log_file
+
+# Background event loop that runs the GUI's subprocess work without blocking Tk
+_loop = None
+
+def get_event_loop():
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+        threading.Thread(target=_loop.run_forever, daemon=True).start()
+    return _loop
+
+def submit(coro):
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+
+def show_message(root, kind, title, message):
+    # Tk dialogs must be opened from the Tk thread, so hand them over via root.after
+    from tkinter import messagebox
+    root.after(0, getattr(messagebox, kind), title, message)
+
+def start_installer(root, install_dir, executable_path):
+    setup_logging()
+    # Run the installer off the Tk thread and hand the result back via root.after
+    def worker():
+        error_message = installer_core.run_installer(install_dir, executable_path)
+        logging.info("Installer finished: %s", error_message or "success", extra={'flush': True})
+        if error_message:
+            show_message(root, 'showerror', "Error", error_message)
+        else:
+            show_message(root, 'showinfo', "Success", "Installation completed successfully.")
+    threading.Thread(target=worker, daemon=True).start()
+
+# Append a line of test output to the Text widget, keeping at most max_lines lines
+def append_output(output_text, line, max_lines=1000):
+    output_text.insert('end', line)
+    excess = int(output_text.index('end-1c').split('.')[0]) - max_lines
+    if excess > 0:
+        output_text.delete('1.0', f'{excess + 1}.0')
+    output_text.see('end')
+
+async def report_test(root, output_text, install_dir, executable_path, prompt_file, output_dir):
+    setup_logging()
+    root.after(0, output_text.delete, '1.0', 'end')
+    success, message = await installer_core.run_test(
+        install_dir, executable_path, prompt_file, output_dir,
+        on_output=lambda line: root.after(0, append_output, output_text, line)
+    )
+    logging.info("Test finished: %s", "success" if success else message, extra={'flush': True})
+    if success:
+        show_message(root, 'showinfo', "Test Response", message)
+    else:
+        show_message(root, 'showerror', "Error", message)
 
 def select_install_dir(entry):
+    import tkinter as tk
+    from tkinter import filedialog
     logging.debug("Opening directory selection dialog for install directory")
     path = filedialog.askdirectory(initialdir=default_install_dir)
-    logging.debug(f"Selected install directory: {path}")
+    logging.debug("Selected install directory: %s", path)
     if path:
         entry.delete(0, tk.END)
         entry.insert(0, path)
 
 def select_executable_path(entry):
+    import tkinter as tk
+    from tkinter import filedialog
     logging.debug("Opening file selection dialog for executable path")
     path = filedialog.askopenfilename(initialdir=".", filetypes=[("Executable files", "*.exe"), ("All files", "*.*")])
-    logging.debug(f"Selected executable path: {path}")
+    logging.debug("Selected executable path: %s", path)
     if path:
         entry.delete(0, tk.END)
         entry.insert(0, path)
 
-def create_gui():
+# One labelled entry row with a browse button; browser is called with the entry widget
+FieldSpec = namedtuple("FieldSpec", "label default browser")
+
+installer_fields = [
+    FieldSpec("Install Directory:", default_install_dir, select_install_dir),
+    FieldSpec("Executable Path:", default_executable_path, select_executable_path),
+]
+
+def make_row(root, spec):
+    import tkinter as tk
+    logging.debug("Adding %s input field", spec.label.rstrip(':').lower())
+    tk.Label(root, text=spec.label).pack(pady=5)
+    entry = tk.Entry(root, width=50)
+    entry.pack(pady=5)
+    entry.insert(0, spec.default)
+    tk.Button(root, text="Browse...", command=lambda: spec.browser(entry)).pack(pady=5)
+    return entry
+
+# Buttons below the entry rows; command is called with (root, output_text, values), where values
+# holds the current text of each field's entry in order
+ActionSpec = namedtuple("ActionSpec", "label command")
+
+def install_command(root, output_text, values):
+    install_dir, executable_path = values
+    start_installer(root, install_dir, executable_path)
+
+def test_command(root, output_text, values):
+    install_dir, executable_path = values
+    submit(report_test(root, output_text, install_dir, executable_path, default_prompt_file, default_output_dir))
+
+installer_actions = [
+    ActionSpec("Install", install_command),
+    ActionSpec("Test Installation", test_command),
+]
+
+def create_gui(fields=installer_fields, actions=installer_actions, title="GPT Processor Installer"):
+    import tkinter as tk
+    setup_logging()
     logging.debug("Creating main GUI window")
     root = tk.Tk()
-    root.title("GPT Processor Installer")
-
-    # Install directory
-    logging.debug("Adding install directory input field")
-    tk.Label(root, text="Install Directory:").pack(pady=5)
-    install_dir_entry = tk.Entry(root, width=50)
-    install_dir_entry.pack(pady=5)
-    install_dir_entry.insert(0, default_install_dir)
-    tk.Button(root, text="Browse...", command=lambda: select_install_dir(install_dir_entry)).pack(pady=5)
-
-    # Executable path
-    logging.debug("Adding executable path input field")
-    tk.Label(root, text="Executable Path:").pack(pady=5)
-    executable_path_entry = tk.Entry(root, width=50)
-    executable_path_entry.pack(pady=5)
-    executable_path_entry.insert(0, default_executable_path)
-    tk.Button(root, text="Browse...", command=lambda: select_executable_path(executable_path_entry)).pack(pady=5)
-
-    # Install button
-    logging.debug("Adding install button")
-    install_button = tk.Button(root, text="Install", command=lambda: run_installer(install_dir_entry.get(), executable_path_entry.get()))
-    install_button.pack(pady=20)
-
-    # Test button
-    logging.debug("Adding test button")
-    test_button = tk.Button(root, text="Test Installation", command=lambda: run_test(install_dir_entry.get(), executable_path_entry.get(), default_prompt_file, default_output_dir))
-    test_button.pack(pady=20)
+    root.title(title)
+
+    # Input rows, one per field
+    entries = [make_row(root, spec) for spec in fields]
+
+    def values():
+        return [entry.get() for entry in entries]
+
+    def make_button(action):
+        logging.debug("Adding %s button", action.label.lower())
+        # output_text is looked up when the button is pressed, after it has been created below
+        button = tk.Button(root, text=action.label, command=lambda: action.command(root, output_text, values()))
+        button.pack(pady=20)
+
+    # Action buttons (install, test)
+    for action in actions:
+        make_button(action)
+
+    # Test output, streamed in while the test command runs
+    logging.debug("Adding test output box")
+    output_text = tk.Text(root, height=15, width=80)
+    output_text.pack(pady=5)
 
     logging.debug("Starting main GUI loop")
     root.mainloop()
 
 if __name__ == "__main__":
+    setup_logging()
     logging.debug("Starting the installer GUI script")
     create_gui()
\ No newline at end of file
@@ -14,29 +14,60 @@ Features:
 # messing
 import os
 import argparse
+import asyncio
+import atexit
+import hashlib
+import importlib
+import importlib.util
+import json
 import logging
+import logging.handlers
+import mmap
+import pickle
+import random
 import sys
 import time
 import schedule
-from concurrent.futures import ThreadPoolExecutor
-
-from requests.exceptions import Timeout
-import requests
-from tkinter import messagebox
-import openai
-from openai.error import RateLimitError, OpenAIError
-
-
-# Attempt to import required packages and handle missing dependencies
-try:
-    import yaml
-    from dotenv import load_dotenv
-except ImportError as e:
-    missing_package = str(e).split("'")[1]
-    print(f"Error: Missing required package '{missing_package}'.")
-    print("Please install all dependencies using:")
-    print("    pip install openai PyYAML python-dotenv")
-    sys.exit(1)
+from functools import lru_cache
+
+# The log formats never include thread/process fields, so skip collecting them per record
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
+
+# Heavy third-party packages are imported on first use so that --help and early
+# exits don't pay their import cost; a missing package still gets a friendly message
+def require(module_name):
+    try:
+        return importlib.import_module(module_name)
+    except ImportError as e:
+        missing_package = e.name or module_name
+        print(f"Error: Missing required package '{missing_package}'.")
+        print("Please install all dependencies using:")
+        print("    pip install httpx[http2] PyYAML python-dotenv")
+        sys.exit(1)
+
+OPENAI_API_URL = 'https://api.openai.com/v1'
+OPENAI_CHAT_URL = OPENAI_API_URL + '/chat/completions'
+
+# File handler over a 64 KiB buffered stream; unlike the stock FileHandler it doesn't
+# flush after every record, only for errors and when the handler is closed
+class BufferedFileHandler(logging.FileHandler):
+    def _open(self):
+        return open(self.baseFilename, self.mode, buffering=65536, encoding=self.encoding, errors=self.errors)
+
+    def emit(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+            if record.levelno >= logging.ERROR:
+                self.stream.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
 
 # Setting up the logger
 def setup_logger(log_level=logging.INFO, log_file=None):
@@ -50,46 +81,127 @@ def setup_logger(log_level=logging.INFO, log_file=None):
     ch.setFormatter(formatter)
     logger.addHandler(ch)
 
-    # File handler
+    # File handler, fed in batches by a MemoryHandler so records reach disk in large writes
     if log_file:
-        fh = logging.FileHandler(log_file)
+        fh = BufferedFileHandler(log_file, encoding='utf-8')
         fh.setLevel(log_level)
         fh.setFormatter(formatter)
-        logger.addHandler(fh)
+        mh = logging.handlers.MemoryHandler(capacity=1024, flushLevel=logging.ERROR, target=fh)
+        mh.setLevel(log_level)
+        logger.addHandler(mh)
+        atexit.register(mh.flush)
 
     return logger
 
+# Push buffered records all the way to disk; the MemoryHandler only flushes on its own
+# at capacity, on an ERROR, or at exit, and BufferedFileHandler keeps them in its stream buffer
+def flush_logger(logger):
+    for handler in logger.handlers:
+        handler.flush()
+        target = getattr(handler, 'target', None)
+        if target:
+            target.flush()
+
+# Module-level logger used by the helper classes; configured by setup_logger
+logger = logging.getLogger('gpt_processor')
+
+# Directory containing this script; used as the base for relative config paths
+@lru_cache(maxsize=1)
+def get_base_directory():
+    return os.path.dirname(os.path.abspath(__file__))
+
 # Ensure directory exists
 def ensure_directory(directory):
-    if not os.path.exists(directory):
-        os.makedirs(directory)
+    os.makedirs(directory, exist_ok=True)
+
+# Parse a YAML config file; repeat loads of an unchanged file are served from memory
+def load_yaml_config(config_file):
+    st = os.stat(config_file)
+    return _load_yaml_config(os.path.abspath(config_file), st.st_mtime_ns, st.st_size)
+
+# Cached per (path, mtime, size); falls back to a pickled copy stored next to the file while it is unchanged.
+# Callers must treat the returned dict as read-only since it is shared between loads.
+@lru_cache(maxsize=8)
+def _load_yaml_config(config_file, st_mtime_ns, st_size):
+    cache_path = config_file + '.pyc-cache'
+    try:
+        with open(cache_path, 'rb') as file:
+            mtime_ns, size, parsed = pickle.load(file)
+        if (mtime_ns, size) == (st_mtime_ns, st_size):
+            return parsed
+    except Exception:
+        pass
+
+    yaml = require('yaml')
+    # Prefer the libyaml-backed loader; the pure-Python parser is several times slower
+    loader = getattr(yaml, 'CSafeLoader', None)
+    if loader is None:
+        logger.warning("PyYAML was built without libyaml; falling back to the slower pure-Python loader. "
+                       "Install libyaml (e.g. libyaml-dev) and reinstall PyYAML for faster config parsing.")
+        loader = yaml.SafeLoader
+    with open(config_file, 'rb') as file:
+        parsed = yaml.load(file, Loader=loader) or {}
+
+    try:
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            pickle.dump((st_mtime_ns, st_size, parsed), file)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.debug("Could not write config cache for '%s': %s", config_file, e)
+    return parsed
+
+# Files at least this large are decoded straight from a memory map
+MMAP_THRESHOLD = 512 * 1024
+
+# Read a whole file once and decode it with the first of encodings that fits; returns (text, encoding).
+# Large files are decoded from a read-only memory map, so the contents aren't first copied into
+# a bytes object alongside the decoded string.
+def read_text(path, encodings=('utf-8-sig',)):
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size < MMAP_THRESHOLD:
+            return _decode_first(file.read(), encodings)
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return _decode_first(mm, encodings)
+
+def _decode_first(buffer, encodings):
+    for encoding in encodings[:-1]:
+        try:
+            return str(buffer, encoding), encoding
+        except UnicodeDecodeError:
+            pass
+    return str(buffer, encodings[-1]), encodings[-1]
 
 # Configuration class
 class Config:
     def __init__(self, config_file=None, base_dir=None):
-        load_dotenv()  # Load environment variables from .env if present
-        default_config = {
-            'prompts_dir': os.path.join(base_dir, 'prompts'),
-            'input_dir': os.path.join(base_dir, 'input'),
-            'output_dir': os.path.join(base_dir, 'output'),
-            'openai': {
-                'api_key': os.getenv('OPENAI_API_KEY'),
-                'model': 'gpt-4',
-                'temperature': 0.7,
-                'max_tokens': 1500
-            }
-        }
         if config_file:
             if not os.path.isfile(config_file):
                 raise FileNotFoundError(f"Configuration file '{config_file}' not found.")
-            with open(config_file, 'r') as file:
-                user_config = yaml.safe_load(file)
+            user_config = load_yaml_config(config_file)
             # Merge user_config into default_config
             self.prompts_dir = os.path.join(base_dir, user_config.get('prompts_dir', 'prompts'))
             self.input_dir = os.path.join(base_dir, user_config.get('input_dir', 'input'))
             self.output_dir = os.path.join(base_dir, user_config.get('output_dir', 'output'))
-            self.openai = self.OpenAI(user_config.get('openai', {}))
+            openai_config = user_config.get('openai', {})
+            # Only consult the environment (and .env) when the config file has no API key
+            if not openai_config.get('api_key'):
+                require('dotenv').load_dotenv()
+                openai_config = dict(openai_config, api_key=os.getenv('OPENAI_API_KEY'))
+            self.openai = self.OpenAI(openai_config)
         else:
+            require('dotenv').load_dotenv()  # Load environment variables from .env if present
+            default_config = {
+                'prompts_dir': os.path.join(base_dir, 'prompts'),
+                'input_dir': os.path.join(base_dir, 'input'),
+                'output_dir': os.path.join(base_dir, 'output'),
+                'openai': {
+                    'api_key': os.getenv('OPENAI_API_KEY'),
+                    'model': 'gpt-4',
+                    'temperature': 0.7,
+                    'max_tokens': 1500
+                }
+            }
             self.prompts_dir = default_config['prompts_dir']
             self.input_dir = default_config['input_dir']
             self.output_dir = default_config['output_dir']
@@ -104,98 +216,662 @@ class Config:
             self.temperature = config.get('temperature', 0.7)
             self.max_tokens = config.get('max_tokens', 1500)
 
+# On-disk cache of prompt file contents, keyed by path and validated by mtime
+_PROMPT_CACHE_DIR = os.path.expanduser(os.path.join('~', '.cache', 'gpt_processor', 'prompts'))
+
 # PromptManager class
 class PromptManager:
+    # In-process cache shared by all instances: full path -> (mtime_ns, text)
+    _cache = {}
+
     def __init__(self, prompts_dir):
         self.prompts_dir = prompts_dir
 
-    def load_prompts(self, prompt_files):
+    async def load_prompts(self, prompt_files):
+        # Read all prompt files concurrently in worker threads so their disk latency overlaps.
+        # Returns (text, ok); ok is False if any file could not be read and was left out
+        results = await asyncio.gather(*(
+            asyncio.to_thread(self.read_prompt, os.path.join(self.prompts_dir, prompt_file))
+            for prompt_file in prompt_files
+        ), return_exceptions=True)
         prompts = []
-        for prompt_file in prompt_files:
+        for prompt_file, result in zip(prompt_files, results):
+            if isinstance(result, Exception):
+                logger.error("Error reading prompt file '%s': %s", prompt_file, result)
+            else:
+                prompts.append(result)
+        return "\n".join(prompts), len(prompts) == len(prompt_files)
+
+    async def load_combined(self, prompt_files):
+        # Cache the joined system prompt as a whole, keyed by each file's path, mtime and size in order,
+        # so an unchanged prompt set costs one stat per file plus a single read
+        paths = [os.path.join(self.prompts_dir, prompt_file) for prompt_file in prompt_files]
+        try:
+            key = []
+            for path in paths:
+                st = os.stat(path)
+                key.append((os.path.abspath(path), st.st_mtime_ns, st.st_size))
+        except OSError:
+            # Let load_prompts report the missing file
+            combined, _ = await self.load_prompts(prompt_files)
+            return combined
+        digest = hashlib.blake2b(repr(key).encode('utf-8')).hexdigest()
+        cache_path = os.path.join(_PROMPT_CACHE_DIR, f"combined-{digest}.txt")
+        try:
+            with open(cache_path, 'rb') as file:
+                return file.read().decode('utf-8')
+        except OSError:
+            pass
+
+        combined, ok = await self.load_prompts(prompt_files)
+        # An incomplete prompt must not be cached, or later runs would reuse it without reporting the error
+        if not ok:
+            return combined
+        try:
+            os.makedirs(_PROMPT_CACHE_DIR, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as file:
+                file.write(combined.encode('utf-8'))
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.debug("Could not write combined prompt cache '%s': %s", cache_path, e)
+        return combined
+
+    def read_prompt(self, full_path):
+        mtime = os.stat(full_path).st_mtime_ns
+        cached = self._cache.get(full_path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        cache_path = os.path.join(_PROMPT_CACHE_DIR, hashlib.blake2b(full_path.encode()).hexdigest())
+        try:
+            with open(cache_path, 'rb') as file:
+                cached = pickle.load(file)
+        except Exception:
+            cached = None
+
+        if cached and cached[0] == mtime:
+            text = cached[1]
+        else:
+            # Decode the raw bytes once instead of going through the incremental text decoder
+            text, _ = read_text(full_path)
             try:
-                with open(os.path.join(self.prompts_dir, prompt_file), 'r', encoding='utf-8') as file:
-                    prompts.append(file.read())
-            except Exception as e:
-                logger.error(f"Error reading prompt file '{prompt_file}': {e}")
-        return "\n".join(prompts)
+                os.makedirs(_PROMPT_CACHE_DIR, exist_ok=True)
+                tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as file:
+                    pickle.dump((mtime, text), file)
+                os.replace(tmp_path, cache_path)
+            except OSError as e:
+                logger.debug("Could not write prompt cache for '%s': %s", full_path, e)
+
+        self._cache[full_path] = (mtime, text)
+        return text
 
 # FileHandler class
 class FileHandler:
     def __init__(self, input_dir, output_dir):
         self.input_dir = input_dir
         self.output_dir = output_dir
+        # Joined once; output_path only appends the input file's name
+        self.output_prefix = os.path.join(output_dir, 'response_')
+
+    def output_path(self, input_file):
+        return self.output_prefix + os.path.basename(input_file)
 
     def list_input_files(self):
         try:
-            return [f for f in os.listdir(self.input_dir) if os.path.isfile(os.path.join(self.input_dir, f))]
+            # scandir exposes the dirent type, so is_file() needs no extra stat per entry
+            with os.scandir(self.input_dir) as entries:
+                return [entry.name for entry in entries if entry.is_file()]
         except Exception as e:
-            logger.error(f"Error listing input files in directory '{self.input_dir}': {e}")
+            logger.error("Error listing input files in directory '%s': %s", self.input_dir, e)
             return []
 
     def read_file(self, file_path):
+        # Read once and decode from that buffer; utf-8-sig also strips a leading BOM
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                return file.read()
+            text, encoding = read_text(file_path, ('utf-8-sig', 'latin-1'))
         except Exception as e:
-            logger.error(f"Error reading file '{file_path}': {e}")
+            logger.error("Error reading file '%s': %s", file_path, e)
             return ""
+        if encoding == 'latin-1':
+            logger.warning("File '%s' is not valid UTF-8; decoded as latin-1", file_path)
+        return text
 
     def write_file(self, file_path, content):
         try:
-            with open(file_path, 'w', encoding='utf-8') as file:
-                file.write(content)
+            # The content is already in memory, so write it with raw fd calls and skip the buffered text layers
+            data = memoryview(content.encode('utf-8'))
+            fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+            try:
+                while data:
+                    data = data[os.write(fd, data):]
+            finally:
+                os.close(fd)
+            return True
         except Exception as e:
-            logger.error(f"Error writing to file '{file_path}': {e}")
+            logger.error("Error writing to file '%s': %s", file_path, e)
+            return False
+
+# Default location of the on-disk response cache
+_RESPONSE_CACHE_DIR = os.path.expanduser(os.path.join('~', '.cache', 'gpt_processor', 'responses'))
+
+# Caching is skipped above this temperature, where repeated calls are expected to differ
+RESPONSE_CACHE_MAX_TEMPERATURE = 0.3
+
+# ResponseCache class: API responses stored on disk, keyed by everything that shapes the reply
+class ResponseCache:
+    def __init__(self, cache_dir=_RESPONSE_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def key(system_prompt, user_prompt, model, temperature, max_tokens, mode=None):
+        parts = (system_prompt or "", user_prompt, model, str(temperature), str(max_tokens))
+        if mode:
+            parts += (mode,)
+        return hashlib.blake2b("\0".join(parts).encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        # Shard by the first two hex digits so no single directory grows too large
+        return os.path.join(self.cache_dir, key[:2], key + '.txt')
+
+    def get(self, key):
+        try:
+            with open(self.path(key), 'rb') as file:
+                return file.read().decode('utf-8')
+        except OSError:
+            return None
+
+    def put(self, key, text):
+        path = self.path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as file:
+                file.write(text.encode('utf-8'))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.debug("Could not write response cache entry '%s': %s", path, e)
+
+# tiktoken encoding for a model, or None when tiktoken isn't installed or its encoding can't be loaded
+# (the encoding files are downloaded on first use, so this can fail offline)
+def load_encoding(model):
+    try:
+        tiktoken = importlib.import_module('tiktoken')
+    except ImportError:
+        logger.debug("tiktoken is not installed; estimating token counts")
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding('cl100k_base')
+    except Exception as e:
+        logger.warning("Could not load the tiktoken encoding for %s (%s); estimating token counts", model, e)
+        return None
+
+# RateLimiter class: request and token buckets that refill continuously up to the per-minute limits,
+# so requests are paced under the account's RPM/TPM ceiling instead of discovering it through 429s
+class RateLimiter:
+    def __init__(self, rpm=None, tpm=None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = float(rpm or 0)
+        self.tokens = float(tpm or 0)
+        self.updated = time.monotonic()
+        self._lock = None
+
+    def refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.updated = now
+        if self.rpm:
+            self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60)
+
+    async def acquire(self, tokens=0):
+        # Waiters are served in order; a request larger than the whole token budget only waits for a full bucket
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                self.refill()
+                wait = 0.0
+                if self.rpm and self.requests < 1:
+                    wait = (1 - self.requests) * 60 / self.rpm
+                needed = min(tokens, self.tpm or 0)
+                if self.tpm and self.tokens < needed:
+                    wait = max(wait, (needed - self.tokens) * 60 / self.tpm)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            if self.rpm:
+                self.requests -= 1
+            if self.tpm:
+                self.tokens -= needed
+
+    def calibrate(self, headers):
+        # Never assume more headroom than the server reports is left
+        self.refill()
+        for header, attr in (('x-ratelimit-remaining-requests', 'requests'), ('x-ratelimit-remaining-tokens', 'tokens')):
+            try:
+                remaining = float(headers[header])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if getattr(self, 'rpm' if attr == 'requests' else 'tpm'):
+                setattr(self, attr, min(getattr(self, attr), remaining))
+
+# Streamed text is handed to a worker thread for writing once this many characters have arrived
+STREAM_WRITE_SIZE = 16 * 1024
+
+# Structured output schema for APIClient.send_batch: one {"id", "text"} entry per input
+_BATCH_RESPONSE_SCHEMA = {
+    "name": "batch_responses",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "responses": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"id": {"type": "integer"}, "text": {"type": "string"}},
+                    "required": ["id", "text"],
+                    "additionalProperties": False
+                }
+            }
+        },
+        "required": ["responses"],
+        "additionalProperties": False
+    }
+}
 
 # APIClient class with timeout, rate limiting, and retry logic
 class APIClient:
-    def __init__(self, api_key, model, temperature, max_tokens, max_retries=3, backoff_factor=2, timeout=10, rate_limit=5):
+    def __init__(self, api_key, model, temperature, max_tokens, max_retries=3, base_delay=1.0, max_delay=30.0, jitter=0.5, timeout=10, rate_limit=5,
+                 max_batch_tokens=4096):
         self.api_key = api_key
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
+        # Upper bound on the completion budget of a batched request, which models cap well below N x max_tokens
+        self.max_batch_tokens = max_batch_tokens
         self.max_retries = max_retries
-        self.backoff_factor = backoff_factor
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
         self.timeout = timeout
         self.rate_limit = rate_limit
         self.last_request_time = 0
+        self.headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+        # One pooled client for all requests so keep-alive connections are reused across files;
+        # keep every pooled connection alive so bursts up to --max_concurrency don't re-handshake
+        httpx = require('httpx')
+        # HTTP/2 needs the optional h2 package (httpx[http2]); without it, keep-alive HTTP/1.1 still works
+        http2 = importlib.util.find_spec('h2') is not None
+        if not http2:
+            logger.warning("The 'h2' package is not installed; using HTTP/1.1. Install httpx[http2] to enable HTTP/2.")
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=100),
+            timeout=30.0,
+            http2=http2
+        )
+        self.system_prompt = None
+        self._body_prefix = None
+        # Optional ResponseCache; set by the caller when caching is enabled
+        self.response_cache = None
+        # Stream responses straight into the output file; set by the caller
+        self.stream = False
+        # Monotonic time before which no request is sent, shared by all concurrent requests after a 429
+        self.hold_until = 0.0
+        # Requests in a row that gave up because they stayed rate limited through every retry
+        self.rate_limit_failures = 0
+        # Optional RateLimiter; set by the caller when --rpm/--tpm are given
+        self.limiter = None
+        # Token counting state, filled in on first use so tiktoken is only loaded when it is needed
+        self._encoding = None
+        self._system_tokens = None
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
 
     def rate_limited_request(self, url):
         current_time = time.time()
         if current_time - self.last_request_time < 60 / self.rate_limit:
             time.sleep(60 / self.rate_limit - (current_time - self.last_request_time))
+        requests = require('requests')
         response = requests.get(url, timeout=self.timeout)
         self.last_request_time = time.time()
         return response
 
-    def send_prompt(self, system_prompt, user_prompt, logger):
-        openai.api_key = self.api_key
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ]
+    def backoff_delay(self, attempt):
+        # Capped exponential backoff with jitter so concurrent workers don't retry in lockstep
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return delay * (1 + random.random() * self.jitter)
+
+    @staticmethod
+    def retry_after(response):
+        # Honor the server-provided wait when present, preferring the millisecond-precision header
+        for header, scale in (('retry-after-ms', 0.001), ('retry-after', 1.0)):
+            try:
+                return float(response.headers.get(header)) * scale
+            except (TypeError, ValueError):
+                continue
+        return None
+
+    async def wait_for_hold(self):
+        # Wait out a rate-limit window another request has already been told about
+        delay = self.hold_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def prepare(self, system_prompt):
+        # Serialize the static part of the request body once; only the user message varies per file
+        payload = {
+            "model": self.model,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "messages": [{"role": "system", "content": system_prompt}]
+        }
+        # Drop the closing ']}' so each user message can be appended to the messages list
+        self._body_prefix = json.dumps(payload).encode('utf-8')[:-2] + b', '
+        self.system_prompt = system_prompt
+        self._system_tokens = None
+
+    def build_body(self, user_prompt, stream=False):
+        if self._body_prefix is None:
+            raise RuntimeError("APIClient.prepare() must be called with the system prompt before sending requests.")
+        user_message = json.dumps({"role": "user", "content": user_prompt}).encode('utf-8')
+        return self._body_prefix + user_message + (b'], "stream": true}' if stream else b']}')
+
+    def load_encoding(self):
+        # Loading can read or download files, so callers on the event loop should do this up front;
+        # a failed load is remembered and every later count uses the estimate
+        if self._encoding is None:
+            self._encoding = load_encoding(self.model) or False
+        return self._encoding
+
+    def count_tokens(self, text):
+        # Exact with tiktoken when it is installed, otherwise about four characters per token
+        if not self.load_encoding():
+            return len(text) // 4 + 1
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+    def system_tokens(self):
+        # The system prompt is the same for every request, so it is only counted once
+        if self._system_tokens is None:
+            self._system_tokens = self.count_tokens(self.system_prompt or "")
+        return self._system_tokens
+
+    def estimate_request_tokens(self, user_prompt, max_tokens=None):
+        # Tokens a request counts against the TPM limit: the prompt plus the completion budget
+        if not self.limiter or not self.limiter.tpm:
+            return 0
+        return self.system_tokens() + self.count_tokens(user_prompt) + (max_tokens or self.max_tokens)
+
+    async def throttle(self, tokens):
+        if self.limiter:
+            await self.limiter.acquire(tokens)
+
+    def calibrate(self, response):
+        if self.limiter:
+            self.limiter.calibrate(response.headers)
+
+    async def post(self, body, logger, tokens=0):
+        # POST a serialized request body and return the decoded JSON reply
+        async def request():
+            await self.throttle(tokens)
+            response = await self.client.post(OPENAI_CHAT_URL, headers=self.headers, content=body)
+            self.calibrate(response)
+            response.raise_for_status()
+            return response.json()
+        return await self.with_retries(request, logger)
+
+    async def with_retries(self, request, logger, idempotent=True):
+        # Run request(), retrying rate limits, server errors and dropped connections. When the request
+        # is not idempotent, only 429s (which the server did not act on) are retried, since a 5xx or a
+        # dropped connection may have come after the server already acted on it
+        httpx = require('httpx')
         for attempt in range(1, self.max_retries + 1):
+            await self.wait_for_hold()
             try:
-                response = openai.ChatCompletion.create(
-                    model=self.model,
-                    messages=messages,
-                    temperature=self.temperature,
-                    max_tokens=self.max_tokens
-                )
-                return response.choices[0].message['content'].strip()
-            except RateLimitError as e:
-                logger.error(f"Rate limit exceeded on attempt {attempt}: {e}")
-            except OpenAIError as e:
-                logger.error(f"OpenAI API error on attempt {attempt}: {e}")
-            except Exception as e:
-                logger.error(f"Unexpected error on attempt {attempt}: {e}")
+                result = await request()
+                self.rate_limit_failures = 0
+                return result
+            except httpx.HTTPStatusError as e:
+                status = e.response.status_code
+                rate_limited = status == 429
+                if rate_limited:
+                    logger.error("Rate limit exceeded on attempt %s: %s", attempt, e)
+                    retry_after = self.retry_after(e.response)
+                elif status >= 500 and idempotent:
+                    logger.error("OpenAI API error on attempt %s: %s", attempt, e)
+                    retry_after = None
+                else:
+                    # Invalid request / authentication errors will not succeed on retry
+                    logger.error("OpenAI API error: %s", e)
+                    raise
+                error = e
+            except httpx.TransportError as e:
+                logger.error("Connection error on attempt %s: %s", attempt, e)
+                if not idempotent:
+                    raise
+                rate_limited = False
+                retry_after = None
+                error = e
             if attempt < self.max_retries:
-                sleep_time = self.backoff_factor ** attempt
-                logger.info(f"Retrying in {sleep_time} seconds...")
-                time.sleep(sleep_time)
+                if retry_after is not None:
+                    # Hold every in-flight request for the reported window, then spread the retries out
+                    # so they don't all land at once when it ends
+                    self.hold_until = max(self.hold_until, time.monotonic() + retry_after)
+                    sleep_time = retry_after + random.uniform(0, self.jitter * self.backoff_delay(attempt))
+                else:
+                    sleep_time = self.backoff_delay(attempt)
+                logger.info("Retrying in %.2f seconds...", sleep_time)
+                await asyncio.sleep(sleep_time)
             else:
                 logger.error("Max retries reached. Failed to get a response from OpenAI API.")
-                raise
+                if rate_limited:
+                    self.rate_limit_failures += 1
+                raise error
+
+    async def api_request(self, method, path, logger, **kwargs):
+        # Authenticated request to another API endpoint (Files, Batches); the caller sets the body type.
+        # Only GETs are retried after server or connection errors; a repeated POST could create a
+        # second file or a second billed batch
+        headers = {"Authorization": self.headers["Authorization"]}
+        async def request():
+            response = await self.client.request(method, OPENAI_API_URL + path, headers=headers, **kwargs)
+            response.raise_for_status()
+            return response
+        return await self.with_retries(request, logger, idempotent=method == 'GET')
+
+    def batch_line(self, custom_id, user_prompt):
+        # One Batch API request line, embedding the same pre-serialized body send_prompt would POST
+        return (b'{"custom_id": ' + json.dumps(custom_id).encode('utf-8')
+                + b', "method": "POST", "url": "/v1/chat/completions", "body": '
+                + self.build_body(user_prompt) + b'}\n')
+
+    async def submit_batch(self, jsonl, logger):
+        upload = await self.api_request('POST', '/files', logger, data={"purpose": "batch"},
+                                        files={"file": ("batch.jsonl", jsonl, "application/jsonl")})
+        batch = await self.api_request('POST', '/batches', logger, json={
+            "input_file_id": upload.json()['id'],
+            "endpoint": "/v1/chat/completions",
+            "completion_window": "24h"
+        })
+        return batch.json()
+
+    async def wait_for_batch(self, batch_id, logger, poll_interval=60):
+        # Poll until the batch reaches a terminal state and return its final status object. A batch can
+        # take up to 24 hours, so rate limits, server errors and network failures only delay the next poll
+        httpx = require('httpx')
+        while True:
+            try:
+                batch = (await self.api_request('GET', f'/batches/{batch_id}', logger)).json()
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code != 429 and e.response.status_code < 500:
+                    raise
+                logger.warning("Could not poll batch %s (%s); trying again in %s seconds", batch_id, e, poll_interval)
+            except httpx.TransportError as e:
+                logger.warning("Could not poll batch %s (%s); trying again in %s seconds", batch_id, e, poll_interval)
+            else:
+                if batch['status'] in ('completed', 'failed', 'expired', 'cancelled'):
+                    return batch
+                logger.info("Batch %s is %s (%s)", batch_id, batch['status'], batch.get('request_counts'))
+            await asyncio.sleep(poll_interval)
+
+    async def download_file(self, file_id, logger):
+        return (await self.api_request('GET', f'/files/{file_id}/content', logger)).content
+
+    async def stream_prompt(self, user_prompt, output_file, logger):
+        # Stream the completion into output_file as tokens arrive instead of holding the whole reply.
+        # The text goes to a .part file that only replaces output_file once the stream has completed
+        # ([DONE] or a finish_reason); an error event or a stream cut short raises and discards it.
+        # Like send_prompt, the written reply has leading and trailing whitespace stripped.
+        part_file = output_file + '.part'
+
+        async def request():
+            await self.throttle(tokens)
+            async with self.client.stream('POST', OPENAI_CHAT_URL, headers=self.headers, content=body) as response:
+                self.calibrate(response)
+                if response.is_error:
+                    await response.aread()
+                    response.raise_for_status()
+                file = await asyncio.to_thread(open, part_file, 'w', encoding='utf-8')
+                try:
+                    # Deltas are collected and written in worker threads in STREAM_WRITE_SIZE pieces, always
+                    # holding back trailing whitespace since it may turn out to be the end of the reply
+                    pending = ""
+                    started = False
+                    completed = False
+                    async for line in response.aiter_lines():
+                        if not line.startswith('data: '):
+                            continue
+                        data = line[6:]
+                        if data == '[DONE]':
+                            completed = True
+                            break
+                        event = json.loads(data)
+                        if event.get('error'):
+                            raise RuntimeError(f"stream failed: {event['error']}")
+                        choices = event.get('choices')
+                        if choices and choices[0].get('finish_reason'):
+                            completed = True
+                        delta = choices and choices[0].get('delta', {}).get('content')
+                        if not delta:
+                            continue
+                        if not started:
+                            delta = delta.lstrip()
+                            started = bool(delta)
+                        pending += delta
+                        if len(pending) >= STREAM_WRITE_SIZE:
+                            text = pending.rstrip()
+                            await asyncio.to_thread(file.write, text)
+                            pending = pending[len(text):]
+                    if not completed:
+                        raise RuntimeError("stream ended before the response was complete")
+                    await asyncio.to_thread(file.write, pending.rstrip())
+                finally:
+                    await asyncio.to_thread(file.close)
+            os.replace(part_file, output_file)
+
+        body = self.build_body(user_prompt, stream=True)
+        tokens = self.estimate_request_tokens(user_prompt)
+        try:
+            await self.with_retries(request, logger)
+        finally:
+            if os.path.exists(part_file):
+                os.remove(part_file)
+
+    def cache_key(self, user_prompt, batch_size=None):
+        # Batched replies share one token budget and are answered alongside other inputs,
+        # so they are kept apart from single replies and from batches of another size
+        if batch_size is None:
+            return ResponseCache.key(self.system_prompt, user_prompt, self.model, self.temperature, self.max_tokens)
+        return ResponseCache.key(self.system_prompt, user_prompt, self.model, self.temperature,
+                                 self.batch_max_tokens(batch_size), mode=f"batch:{batch_size}")
+
+    def batch_max_tokens(self, batch_size):
+        # Leave room for every answer in the one reply, within what the model accepts
+        return min(self.max_tokens * batch_size, self.max_batch_tokens)
+
+    async def send_prompt(self, user_prompt, logger):
+        if self.response_cache:
+            key = self.cache_key(user_prompt)
+            cached = await asyncio.to_thread(self.response_cache.get, key)
+            if cached is not None:
+                logger.debug("Response cache hit for %s", key)
+                return cached
+        result = await self.post(self.build_body(user_prompt), logger, self.estimate_request_tokens(user_prompt))
+        response = result['choices'][0]['message']['content'].strip()
+        if self.response_cache:
+            await asyncio.to_thread(self.response_cache.put, key, response)
+        return response
+
+    async def send_batch(self, user_prompts, logger):
+        # Only send the prompts that aren't already cached
+        if not self.response_cache:
+            return await self.request_batch(user_prompts, logger)
+        keys = [self.cache_key(prompt, len(user_prompts)) for prompt in user_prompts]
+        responses = await asyncio.gather(*(asyncio.to_thread(self.response_cache.get, key) for key in keys))
+        misses = [i for i, response in enumerate(responses) if response is None]
+        if misses:
+            fresh = await self.request_batch([user_prompts[i] for i in misses], logger)
+            for i, response in zip(misses, fresh):
+                responses[i] = response
+                # Keyed by the batch actually sent, which is smaller than the lookup's when some prompts hit
+                key = self.cache_key(user_prompts[i], len(misses))
+                await asyncio.to_thread(self.response_cache.put, key, response)
+        return responses
+
+    async def request_batch(self, user_prompts, logger):
+        # Answer several prompts with one request: the prompts are concatenated with <<FILE i>> markers
+        # and the model returns one JSON entry per marker. Raises ValueError if the request is rejected
+        # (e.g. the model doesn't support structured outputs) or the reply doesn't parse.
+        httpx = require('httpx')
+        sections = "\n\n".join(f"<<FILE {i}>>\n{prompt}" for i, prompt in enumerate(user_prompts))
+        user_prompt = (
+            f"The following {len(user_prompts)} inputs are separated by <<FILE i>> markers. "
+            "Answer each one independently, as if it were the only input, and return one entry "
+            "per input in the responses list with its id set to i.\n\n" + sections
+        )
+        payload = {
+            "model": self.model,
+            "temperature": self.temperature,
+            "max_tokens": self.batch_max_tokens(len(user_prompts)),
+            "messages": [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "response_format": {"type": "json_schema", "json_schema": _BATCH_RESPONSE_SCHEMA}
+        }
+        tokens = self.estimate_request_tokens(user_prompt, payload['max_tokens'])
+        try:
+            result = await self.post(json.dumps(payload).encode('utf-8'), logger, tokens)
+        except httpx.HTTPStatusError as e:
+            # Authentication errors, exhausted rate limits and server errors would fail per file too;
+            # other client errors (400, 404, 413, 422, ...) are specific to the batched form
+            status = e.response.status_code
+            if 400 <= status < 500 and status not in (401, 403, 429):
+                raise ValueError(f"batch request rejected with status {status}") from e
+            raise
+        choice = result['choices'][0]
+        if choice.get('finish_reason') == 'length':
+            raise ValueError("batch response was truncated")
+        try:
+            entries = json.loads(choice['message']['content'])['responses']
+            texts = {int(entry['id']): entry['text'].strip() for entry in entries}
+            return [texts[i] for i in range(len(user_prompts))]
+        except (TypeError, KeyError, ValueError) as e:
+            raise ValueError(f"malformed batch response: {e!r}") from e
 
 # Function to create default prompt file if not exists
 def create_default_prompt(prompts_dir):
@@ -209,7 +885,7 @@ def create_default_prompt(prompts_dir):
             with open(default_prompt_path, 'w', encoding='utf-8') as file:
                 file.write(default_prompt)
         except Exception as e:
-            logger.error(f"Error creating default prompt file '{default_prompt_path}': {e}")
+            logger.error("Error creating default prompt file '%s': %s", default_prompt_path, e)
 
 # Function to check if a path is a directory
 def is_directory(path):
@@ -217,7 +893,8 @@ def is_directory(path):
 
 # Function to list files in a directory
 def list_files_in_directory(directory):
-    return [os.path.join(directory, f) for f in os.listdir(directory) if os.path.isfile(os.path.join(directory, f))]
+    with os.scandir(directory) as entries:
+        return [entry.path for entry in entries if entry.is_file()]
 
 # Function to create prompts for each file in a directory
 def create_prompts(base_content, directory):
@@ -229,77 +906,186 @@ def create_prompts(base_content, directory):
         prompts.append(prompt)
     return prompts
 
-# Main processing function
-def process_file(input_file, file_handler, api_client, system_prompt, logger):
-    user_prompt = file_handler.read_file(input_file)
+# Main processing function; returns True once the response has been written
+async def process_file(input_file, file_handler, api_client, logger):
+    # Blocking file I/O runs in a worker thread so other requests keep flowing meanwhile
+    user_prompt = await asyncio.to_thread(file_handler.read_file, input_file)
     if not user_prompt:
-        logger.error(f"User prompt is empty for file '{input_file}'")
-        return
+        logger.error("User prompt is empty for file '%s'", input_file)
+        return False
     try:
-        response = api_client.send_prompt(system_prompt, user_prompt, logger)
-        output_file = os.path.join(file_handler.output_dir, f"response_{os.path.basename(input_file)}")
-        file_handler.write_file(output_file, response)
+        output_file = file_handler.output_path(input_file)
+        if api_client.stream:
+            await api_client.stream_prompt(user_prompt, output_file, logger)
+            return True
+        response = await api_client.send_prompt(user_prompt, logger)
+        return await asyncio.to_thread(file_handler.write_file, output_file, response)
     except Exception as e:
-        logger.error(f"Error processing file '{input_file}': {e}")
+        logger.error("Error processing file '%s': %s", input_file, e)
+        return False
 
-def run_test(install_dir, executable_path, prompt_file, output_dir):
-    logging.debug(f"Starting run_test with install_dir={install_dir}, executable_path={executable_path}, prompt_file={prompt_file}, output_dir={output_dir}")
+# Process several input files with one request, falling back to one request per file
+# if the combined response can't be split back up; returns the files that failed
+async def process_batch(input_files, file_handler, api_client, logger):
+    user_prompts = await asyncio.gather(*(asyncio.to_thread(file_handler.read_file, f) for f in input_files))
+    batch = []
+    failed = []
+    for input_file, user_prompt in zip(input_files, user_prompts):
+        if user_prompt:
+            batch.append((input_file, user_prompt))
+        else:
+            logger.error("User prompt is empty for file '%s'", input_file)
+            failed.append(input_file)
+    if not batch:
+        return failed
     try:
-        input_dir = os.path.join(install_dir, 'input')
-        logging.debug(f"Input directory: {input_dir}")
-        
-        # Check if input directory exists
-        if not os.path.exists(input_dir):
-            logging.error(f"Input directory does not exist: {input_dir}")
-            messagebox.showerror("Error", f"Input directory does not exist: {input_dir}")
-            return
-        
-        # Log the contents of the input directory
-        input_files = os.listdir(input_dir)
-        logging.debug(f"Input directory contents: {input_files}")
-        
-        # Check if input directory is empty
-        if not input_files:
-            logging.error("Input directory is empty.")
-            messagebox.showerror("Error", "Input directory is empty.")
-            return
-
-        # Construct the command to run the main script
-        command = [
-            'python', executable_path,
-            '--config', os.path.join(install_dir, 'default_config.yaml'),
-            '--prompt', prompt_file,
-            '--input_dir', input_dir,
-            '--output_dir', output_dir
-        ]
-        logging.debug(f"Running test command: {command}")
-        result = subprocess.run(command, check=True, capture_output=True, text=True)
-        logging.debug(f"Test command output: {result.stdout}")
-        logging.debug(f"Test command error (if any): {result.stderr}")
-
-        # Save the response to the output directory
-        output_file = os.path.join(output_dir, 'test_output.txt')
-        with open(output_file, 'w', encoding='utf-8') as file:
-            file.write(result.stdout)
-        
-        # Display the response in the GUI
-        messagebox.showinfo("Test Response", result.stdout)
-    except subprocess.CalledProcessError as e:
-        error_message = f"Test failed: {e}"
-        logging.error(error_message)
-        logging.debug(f"Test command output: {e.stdout}")
-        logging.debug(f"Test command error: {e.stderr}")
-        messagebox.showerror("Error", error_message)
+        responses = await api_client.send_batch([user_prompt for _, user_prompt in batch], logger)
+    except ValueError as e:
+        logger.warning("Batch of %d files failed (%s); processing them one at a time", len(batch), e)
+        for input_file, _ in batch:
+            if not await process_file(input_file, file_handler, api_client, logger):
+                failed.append(input_file)
+        return failed
     except Exception as e:
-        error_message = f"An error occurred: {e}"
-        logging.error(error_message)
-        messagebox.showerror("Error", error_message)
+        for input_file, _ in batch:
+            logger.error("Error processing file '%s': %s", input_file, e)
+        return failed + [input_file for input_file, _ in batch]
+    for (input_file, _), response in zip(batch, responses):
+        output_file = file_handler.output_path(input_file)
+        if not await asyncio.to_thread(file_handler.write_file, output_file, response):
+            failed.append(input_file)
+    return failed
+
+# Process all input files concurrently on a single event loop; returns the files that failed
+async def process_files(input_files, input_dir, file_handler, api_client, logger, max_concurrency=64, batch_size=1,
+                        max_rate_limit_failures=5):
+    paths = [os.path.join(input_dir, f) for f in input_files]
+    chunks = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+    # Bound the number of in-flight requests to keep rate-limit pressure in check
+    if max_concurrency < 1:
+        raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}")
+    semaphore = asyncio.Semaphore(max(1, min(max_concurrency, len(chunks))))
+
+    async def bounded(chunk):
+        async with semaphore:
+            try:
+                if len(chunk) == 1:
+                    ok = await process_file(chunk[0], file_handler, api_client, logger)
+                    return chunk, [] if ok else chunk
+                return chunk, await process_batch(chunk, file_handler, api_client, logger)
+            except Exception as e:
+                logger.error("Error processing files %s: %s", chunk, e)
+                return chunk, chunk
 
+    # Closing the client shuts down its connection pool once every file is done
+    async with api_client:
+        tasks = [asyncio.ensure_future(bounded(chunk)) for chunk in chunks]
+        finished = set()
+        failed = []
+        # Collect results as they finish so progress is visible and persistent rate limiting can stop the run
+        for future in asyncio.as_completed(tasks):
+            chunk, chunk_failed = await future
+            finished.update(chunk)
+            failed.extend(chunk_failed)
+            logger.info("Processed %d/%d files", len(finished), len(paths))
+            if api_client.rate_limit_failures >= max_rate_limit_failures:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                # Tasks that finished before the cancel still count; only the cancelled ones went unprocessed
+                unprocessed = []
+                for chunk, task in zip(chunks, tasks):
+                    if chunk[0] in finished:
+                        continue
+                    if task.cancelled():
+                        unprocessed.extend(chunk)
+                    else:
+                        chunk, chunk_failed = task.result()
+                        finished.update(chunk)
+                        failed.extend(chunk_failed)
+                logger.error("Stopping: %d requests in a row failed on rate limits; %d files were not processed",
+                             api_client.rate_limit_failures, len(unprocessed))
+                failed.extend(unprocessed)
+                break
+    return failed
+
+# Process all input files through the Batch API: cheaper and outside the synchronous rate limits,
+# but results can take up to 24 hours. Pass batch_id to collect the results of an earlier submission
+# instead of submitting again. Returns the files that failed
+async def process_files_batch_api(input_files, input_dir, file_handler, api_client, logger, poll_interval=60,
+                                  batch_id=None):
+    user_prompts = await asyncio.gather(*(
+        asyncio.to_thread(file_handler.read_file, os.path.join(input_dir, f)) for f in input_files
+    ))
+    lines = []
+    pending = set()
+    failed = []
+    for input_file, user_prompt in zip(input_files, user_prompts):
+        if user_prompt:
+            lines.append(api_client.batch_line(input_file, user_prompt))
+            pending.add(input_file)
+        else:
+            logger.error("User prompt is empty for file '%s'", input_file)
+            failed.append(input_file)
+    if not lines:
+        return failed
+
+    async with api_client:
+        if batch_id is None:
+            try:
+                batch_id = (await api_client.submit_batch(b''.join(lines), logger))['id']
+            except Exception as e:
+                logger.error("Could not submit the batch of %d requests: %s", len(lines), e)
+                return failed + sorted(pending)
+            # Logged prominently since it is the only handle on the job if this run is interrupted
+            logger.warning("Submitted batch %s with %d requests; if this run is interrupted, collect the results "
+                           "with --batch_api --batch_id %s", batch_id, len(lines), batch_id)
+        try:
+            batch = await api_client.wait_for_batch(batch_id, logger, poll_interval)
+            if batch.get('error_file_id'):
+                logger.error("Batch %s had failed requests; see file %s", batch_id, batch['error_file_id'])
+            if not batch.get('output_file_id'):
+                logger.error("Batch %s ended with status '%s' and no output", batch_id, batch['status'])
+                return failed + sorted(pending)
+            output = await api_client.download_file(batch['output_file_id'], logger)
+        except Exception as e:
+            logger.error("Could not collect the results of batch %s: %s", batch_id, e)
+            return failed + sorted(pending)
+
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        try:
+            result = json.loads(line)
+            input_file = result['custom_id']
+            response = result.get('response') or {}
+            if response.get('status_code') != 200:
+                logger.error("Error processing file '%s': %s", input_file, result.get('error') or response.get('body'))
+                continue
+            content = response['body']['choices'][0]['message']['content'].strip()
+        except (TypeError, KeyError, IndexError, ValueError) as e:
+            logger.error("Malformed line in the output of batch %s: %r", batch_id, e)
+            continue
+        output_file = file_handler.output_path(input_file)
+        if await asyncio.to_thread(file_handler.write_file, output_file, content):
+            pending.discard(input_file)
+    # Anything without a written response, including entries missing from the output, failed
+    return failed + sorted(pending)
 
 # Scheduled job example
 def scheduled_job():
     print("Scheduled job is running")
 
+# argparse type for options that need a count of at least one
+def positive_int(value):
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
 # CLI main function
 
 
@@ -316,6 +1102,16 @@ def main():
     parser.add_argument('--model', type=str, help='OpenAI model to use.')
     parser.add_argument('--temperature', type=float, help='Temperature setting for the OpenAI model.')
     parser.add_argument('--max_tokens', type=int, help='Maximum number of tokens for the OpenAI model.')
+    parser.add_argument('--max_concurrency', type=positive_int, default=64, help='Maximum number of API requests in flight at once.')
+    parser.add_argument('--batch_size', type=positive_int, default=1, help='Number of input files to combine into one API request.')
+    parser.add_argument('--force', action='store_true', help='Reprocess input files that already have a response in the output directory.')
+    parser.add_argument('--rpm', type=int, help='Requests per minute to stay under; requests are paced client-side.')
+    parser.add_argument('--tpm', type=int, help='Tokens per minute to stay under; requests are paced client-side.')
+    parser.add_argument('--stream', action='store_true', help='Stream each response into its output file as it is generated.')
+    parser.add_argument('--batch_api', action='store_true', help='Submit all files through the OpenAI Batch API and wait for the results.')
+    parser.add_argument('--batch_id', type=str, help='With --batch_api, collect the results of an already submitted batch instead of submitting a new one.')
+    parser.add_argument('--cache_dir', type=str, default=_RESPONSE_CACHE_DIR, help='Directory for cached API responses.')
+    parser.add_argument('--no_cache', action='store_true', help='Always call the API instead of reusing cached responses.')
     args = parser.parse_args()
 
     # Set log level based on verbosity
@@ -324,19 +1120,20 @@ def main():
     # Setup logger
     logger = setup_logger(log_level=log_level, log_file=args.log_file)
 
-    # Log environment variables
-    logger.debug(f"Environment variables: {os.environ}")
+    # Log only the size of the environment; dumping it is large and can leak secrets such as API keys
+    logger.debug("Environment variables available: %d keys", len(os.environ))
 
     # Load configuration
     try:
-        config = Config(args.config, base_dir=os.path.dirname(os.path.abspath(__file__)))
-        logger.debug(f"Configuration loaded: {config.__dict__}")
+        config = Config(args.config, base_dir=get_base_directory())
+        logger.debug("Configuration loaded: %s", config.__dict__)
     except Exception as e:
-        logger.error(f"Error loading configuration: {e}")
+        logger.error("Error loading configuration: %s", e)
         sys.exit(1)
 
     # Override config with CLI arguments if provided
     prompt_files = args.prompt if args.prompt else ['standard_prompt.txt']
+    input_dir = args.input_dir if args.input_dir else config.input_dir
     output_dir = args.output_dir if args.output_dir else config.output_dir
     model = args.model if args.model else config.openai.model
     temperature = args.temperature if args.temperature else config.openai.temperature
@@ -344,12 +1141,12 @@ def main():
 
 
     # Log paths and check if they exist
-    logger.debug(f"Prompt files: {prompt_files}")
-    logger.debug(f"Input directory: {input_dir}")
-    logger.debug(f"Output directory: {output_dir}")
+    logger.debug("Prompt files: %s", prompt_files)
+    logger.debug("Input directory: %s", input_dir)
+    logger.debug("Output directory: %s", output_dir)
     for path in [input_dir, output_dir] + prompt_files:
         if not os.path.exists(path):
-            logger.error(f"Path does not exist: {path}")
+            logger.error("Path does not exist: %s", path)
 
 
     # Ensure necessary directories exist
@@ -358,24 +1155,67 @@ def main():
 
     # Load and combine prompts
     prompt_manager = PromptManager(config.prompts_dir)
-    system_prompt = prompt_manager.load_prompts(prompt_files)
+    system_prompt = asyncio.run(prompt_manager.load_combined(prompt_files))
 
     # Initialize file handler and API client
     file_handler = FileHandler(input_dir, output_dir)
     api_client = APIClient(config.openai.api_key, model, temperature, max_tokens)
+    # Build the system message once; every request reuses it
+    api_client.prepare(system_prompt)
+    # Pace requests under the account's limits instead of relying on 429 retries
+    if args.rpm or args.tpm:
+        api_client.limiter = RateLimiter(args.rpm, args.tpm)
+        # Load the tokenizer before the event loop starts so the first request doesn't block it
+        if args.tpm:
+            api_client.load_encoding()
+
+    # Streamed responses go straight to disk, so they are neither batched nor cached
+    batch_size = args.batch_size
+    if args.stream:
+        api_client.stream = True
+        batch_size = 1
+
+    # Reuse earlier responses for identical requests unless sampling makes them non-repeatable
+    if args.no_cache or args.stream:
+        logger.debug("Response cache disabled")
+    elif temperature > RESPONSE_CACHE_MAX_TEMPERATURE:
+        logger.debug("Response cache disabled: temperature %s is above %s", temperature, RESPONSE_CACHE_MAX_TEMPERATURE)
+    else:
+        api_client.response_cache = ResponseCache(args.cache_dir)
 
 
     # List input files
     input_files = file_handler.list_input_files()
-    logger.debug(f"Input files: {input_files}")
+    logger.debug("Input files: %s", input_files)
     if not input_files:
         logger.info("No input files found. Exiting.")
         sys.exit(0)
 
-    # Process files concurrently
-    with ThreadPoolExecutor(max_workers=min(5, len(input_files))) as executor:
-        for input_file in input_files:
-            executor.submit(process_file, os.path.join(input_dir, input_file), file_handler, api_client, system_prompt, logger)
+    # Skip files whose response is already in the output directory, e.g. when resuming an interrupted run
+    if not args.force:
+        with os.scandir(output_dir) as entries:
+            done = {entry.name for entry in entries if entry.is_file()}
+        skipped = [f for f in input_files if f"response_{f}" in done]
+        if skipped:
+            logger.info("Skipping %d already-processed files (use --force to reprocess them)", len(skipped))
+            input_files = [f for f in input_files if f"response_{f}" not in done]
+        if not input_files:
+            logger.info("All input files have already been processed. Exiting.")
+            sys.exit(0)
+
+    # Process files concurrently, or hand them all to the Batch API for non-interactive runs
+    if args.batch_api:
+        failed = asyncio.run(process_files_batch_api(input_files, input_dir, file_handler, api_client, logger,
+                                                     batch_id=args.batch_id))
+    else:
+        failed = asyncio.run(process_files(input_files, input_dir, file_handler, api_client, logger, max_concurrency=args.max_concurrency, batch_size=batch_size))
+    if failed:
+        logger.error("%d of %d files failed and have no response: %s", len(failed), len(input_files),
+                     ", ".join(sorted(os.path.basename(f) for f in failed)))
+    else:
+        logger.info("All %d files processed successfully", len(input_files))
+    # main never returns from the schedule loop below, so don't leave this run's log lines buffered
+    flush_logger(logger)
 
     # Schedule events
     schedule.every().day.at("10:30").do(scheduled_job)
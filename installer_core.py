@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+GPT Processor Installer Core
+
+Features:
+- Runs the installer in-process with a constructed argument list.
+- Runs a test pass of the installed main script as an asyncio subprocess,
+  streaming its output line by line, using the current interpreter.
+- Reports results as return values so any front end (e.g. the Tk GUI) can display them.
+"""
+
+import asyncio
+import collections
+import locale
+import logging
+import os
+import subprocess
+import sys
+
+import gpt_processor_installer
+
+def run_installer(install_dir, executable_path):
+    logging.debug("Starting run_installer with install_dir=%s, executable_path=%s", install_dir, executable_path)
+    argv = [
+        '--install_dir', install_dir,
+        '--main_executable', executable_path
+    ]
+    logging.debug("Running installer in-process with arguments: %s", argv)
+    try:
+        gpt_processor_installer.main(argv)
+    except SystemExit as e:
+        # The installer reports failures by exiting non-zero
+        if e.code:
+            error_message = f"Installation failed with exit code {e.code}"
+            logging.error(error_message)
+            return error_message
+    except Exception as e:
+        error_message = f"Installation failed: {e}"
+        logging.error(error_message)
+        return error_message
+    return None
+
+# Returns (success, message): the tail of the command's output on success, otherwise an error
+# message. Each output line is also passed to on_output as it arrives, if given.
+async def run_test(install_dir, executable_path, prompt_file, output_dir, on_output=None, tail_lines=200):
+    logging.debug("Starting run_test with install_dir=%s, executable_path=%s, prompt_file=%s, output_dir=%s", install_dir, executable_path, prompt_file, output_dir)
+    try:
+        input_dir = os.path.join(install_dir, 'input')
+        logging.debug("Input directory: %s", input_dir)
+        
+        # Check if input directory exists
+        if not os.path.exists(input_dir):
+            logging.error("Input directory does not exist: %s", input_dir)
+            return False, f"Input directory does not exist: {input_dir}"
+        
+        # Log the contents of the input directory
+        input_files = os.listdir(input_dir)
+        logging.debug("Input directory contents: %s", input_files)
+        
+        # Check if input directory is empty
+        if not input_files:
+            logging.error("Input directory is empty.")
+            return False, "Input directory is empty."
+
+        # Construct the command to run the main script
+        command = [
+            sys.executable, executable_path,
+            '--config', os.path.join(install_dir, 'default_config.yaml'),
+            '--prompt', prompt_file,
+            '--input_dir', input_dir,
+            '--output_dir', output_dir
+        ]
+        logging.debug("Running test command: %s", command)
+        # Open the output file first so a bad output directory fails before anything is started
+        output_file = os.path.join(output_dir, 'test_output.txt')
+        with open(output_file, 'w', encoding='utf-8') as file:
+            proc = await asyncio.create_subprocess_exec(
+                *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT, limit=1024 * 1024
+            )
+            try:
+                encoding = locale.getpreferredencoding(False)
+                # Stream the output to the output directory as it arrives, keeping only a bounded tail in memory
+                tail = collections.deque(maxlen=tail_lines)
+                async for raw_line in proc.stdout:
+                    line = raw_line.decode(encoding, errors='replace')
+                    file.write(line)
+                    tail.append(line)
+                    if on_output:
+                        on_output(line)
+                returncode = await proc.wait()
+            finally:
+                # Don't leave the child running if reading its output failed or was cancelled
+                if proc.returncode is None:
+                    proc.kill()
+                    await proc.wait()
+        output = ''.join(tail)
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, command, output)
+        logging.debug("Test command output (last %d lines): %s", len(tail), output)
+
+        return True, output
+    except subprocess.CalledProcessError as e:
+        error_message = f"Test failed: {e}"
+        logging.error(error_message)
+        logging.debug("Test command output (last lines): %s", e.stdout)
+        return False, error_message
+    except Exception as e:
+        error_message = f"An error occurred: {e}"
+        logging.error(error_message)
+        return False, error_message